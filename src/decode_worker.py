@@ -0,0 +1,58 @@
+# 解混淆进程池的子进程中执行的函数
+#
+# 本模块只依赖 Pillow 和 jmcomic，导入时没有任何副作用。进程池提交的函数都放在这里，
+# 子进程按模块名导入即可反序列化，不依赖主模块（server.py）能否被子进程导入。
+import io
+import os
+import sys
+
+from PIL import Image
+from jmcomic import JmImageTool
+
+
+def init_worker() -> None:
+    """子进程初始化：stdio模式下stdout是MCP的JSON-RPC管道，子进程的输出一律改写到stderr"""
+    sys.stdout = sys.stderr
+
+
+def descramble_image_file(raw_path: str, save_path: str, num: int) -> None:
+    """还原混淆的原始图片并保存到 save_path，完成后删除原始图片"""
+    try:
+        with Image.open(raw_path) as img:
+            JmImageTool.decode_and_save(num, img, save_path)
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+
+class JpegPageImageTool(JmImageTool):
+    """复用jmcomic的还原逻辑，但以固定的JPEG质量保存页面"""
+
+    JPEG_QUALITY = 85
+
+    @classmethod
+    def save_image(cls, image: Image.Image, filepath):
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(filepath, quality=cls.JPEG_QUALITY)
+
+
+def prepare_page_bytes(raw: bytes, num: int, to_jpeg: bool) -> bytes:
+    """
+    在内存中还原图片并编码为JPEG（无盘模式使用）
+
+    Args:
+        raw: 服务器返回的原始图片字节
+        num: 图片分割数，0表示不需要还原
+        to_jpeg: 不需要还原时是否也转换为JPEG，为False时原样返回
+    """
+    if num == 0 and not to_jpeg:
+        return raw
+
+    buf = io.BytesIO()
+    # Pillow根据文件对象的name推断保存格式
+    buf.name = 'page.jpg'
+    with Image.open(io.BytesIO(raw)) as img:
+        img.seek(0)
+        JpegPageImageTool.decode_and_save(num, img, buf)
+    return buf.getvalue()
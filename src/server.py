@@ -1,24 +1,78 @@
 from mcp.server import FastMCP
 from jmcomic import (
     create_option_by_file, JmOption, JmAlbumDetail, JmSearchPage, 
-    JmCategoryPage, download_album, JmcomicException, JmMagicConstants
+    JmCategoryPage, JmcomicException, JmMagicConstants,
+    JmApiClient, JmApiResp, JmApiAdaptTool, JmPageTool, JmCryptoTool,
+    JmModuleConfig, JmcomicText, ExceptionTool, RequestRetryAllFailException,
+    time_stamp, JmDownloader, JmImageDetail, JmImageTool, catch_exception, file_exists,
+    JmPhotoDetail, fix_windir_name
 )
+from mcp.server.fastmcp import Context
 import os
+import io
 import asyncio
 import json
 import itertools
 import functools
 import threading
 import time
+import uuid
+import weakref
+import queue
 import argparse
+import contextlib
+import multiprocessing
+import zipfile
 import yaml
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image
-from typing import List, Optional
+from curl_cffi import CurlError
+from curl_cffi.requests import AsyncSession
+from typing import Callable, Dict, List, Optional
+from decode_worker import init_worker, descramble_image_file, prepare_page_bytes
+
+try:
+    import pikepdf
+except ImportError:  # 没有pikepdf时跳过PDF后处理
+    pikepdf = None
 
 def parse_args():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description='JM Comic MCP Server')
     parser.add_argument('--storage-path', type=str, help='自定义下载存储路径')
+    parser.add_argument('--transport', type=str, default='stdio',
+                        choices=['stdio', 'sse', 'streamable-http'],
+                        help='MCP传输方式，sse/streamable-http 模式下一个进程可同时服务多个客户端')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='HTTP模式监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='HTTP模式监听端口')
+    parser.add_argument('--client-pool-size', type=int, default=8,
+                        help='共享的jmcomic客户端池大小（所有MCP客户端共用）')
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help='op.yml未配置client.cache时，共享的搜索/详情缓存最多保留的条目数')
+    parser.add_argument('--cache-ttl', type=float, default=600,
+                        help='共享的搜索/详情缓存的过期时间（秒）')
+    parser.add_argument('--max-jobs', type=int, default=4,
+                        help='全局同时执行的后台下载任务数')
+    parser.add_argument('--max-jobs-per-client', type=int, default=2,
+                        help='单个MCP客户端同时执行的后台下载任务数，超出部分排队')
+    parser.add_argument('--pdf-memory-budget', type=int, default=None,
+                        help='PDF转换可占用的总内存预算（MB），默认为物理内存的一半')
+    parser.add_argument('--max-conversions', type=int, default=4,
+                        help='同时执行的PDF转换数上限，包括下载后的自动转换（仍受内存预算约束）')
+    parser.add_argument('--http-max-connections', type=int, default=100,
+                        help='异步元数据请求的连接池上限（保持长连接复用）')
+    parser.add_argument('--http-timeout', type=float, default=15.0,
+                        help='异步元数据请求的单次超时时间（秒）')
+    parser.add_argument('--sync-client', action='store_true',
+                        help='禁用异步元数据客户端，所有请求都在线程池中使用jmcomic同步客户端')
+    parser.add_argument('--optimize-pdf', action='store_true',
+                        help='生成PDF后使用pikepdf线性化、压缩对象流，并按章节添加页码标签和书签')
+    parser.add_argument('--stream-window', type=int, default=32,
+                        help='无盘模式下同时下载、还原和缓冲的最大页数，页码超出窗口的下载线程会在请求图片前等待')
+    parser.add_argument('--decode-workers', type=int, default=0,
+                        help='图片解混淆进程数，大于0时下载线程只保存原始图片，由进程池并行还原；0表示在下载线程中还原')
     # 使用parse_known_args来忽略未知参数，这样可以兼容mcp dev命令
     args, unknown = parser.parse_known_args()
     return args
@@ -52,20 +106,554 @@ def update_config_file(storage_path: str):
 # 解析命令行参数
 args = parse_args()
 
+# 以spawn方式启动的解混淆子进程会重新执行本文件的顶层代码，子进程只需要 decode_worker，
+# 不能重写配置文件、执行登录插件或向stdout（stdio模式下的JSON-RPC管道）输出
+IS_MAIN_PROCESS = multiprocessing.current_process().name == 'MainProcess'
+
 # 如果提供了存储路径参数，更新配置文件
-if args.storage_path:
+if args.storage_path and IS_MAIN_PROCESS:
     update_config_file(args.storage_path)
 
 # It's good practice to use an option file for jmcomic
 # For now, we can create a default one.
 # A file `op.yml` could be created in the future for customization.
-try:
-    option = create_option_by_file('op.yml')
-except FileNotFoundError:
+if IS_MAIN_PROCESS:
+    try:
+        option = create_option_by_file('op.yml')
+    except FileNotFoundError:
+        option = JmOption.default()
+else:
     option = JmOption.default()
 
-client = option.new_jm_client()
-app = FastMCP('jm-comic-server')
+
+class TtlLruCache:
+    """
+    有容量上限和过期时间的线程安全缓存
+
+    实现了jmcomic客户端缓存所需的 get / __setitem__ 接口，可以通过 set_cache_dict 替换客户端的缓存。
+    超过 max_size 时淘汰最久未使用的条目，超过 ttl 秒的条目视为不存在。
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class JmClientPool:
+    """
+    共享的jmcomic客户端池
+
+    jmcomic的客户端不保证线程安全，因此每个请求从池中借出一个独占的客户端，用完归还。
+    客户端按需创建，最多创建 size 个，池耗尽时借用方会阻塞等待。
+    op.yml未配置 client.cache 时，池内所有客户端共用一个 TtlLruCache，搜索和详情结果在
+    所有MCP客户端之间共享；配置了 client.cache 时按jmcomic的配置处理。
+    """
+
+    def __init__(self, option: JmOption, size: int, cache: Optional[TtlLruCache] = None):
+        self.option = option
+        self.size = max(1, size)
+        self.cache = cache
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_client(self):
+        jm_client = self.option.new_jm_client()
+        if self.option.client.cache is None and self.cache is not None:
+            jm_client.set_cache_dict(self.cache)
+        return jm_client
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """借出一个客户端，with块结束后自动归还"""
+        try:
+            jm_client = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    jm_client = self._new_client()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                jm_client = self._idle.get()
+        try:
+            yield jm_client
+        finally:
+            self._idle.put(jm_client)
+
+    def call(self, method: str, *args, **kwargs):
+        """借出客户端并调用其方法，供 run_in_executor 使用"""
+        with self.acquire() as jm_client:
+            return getattr(jm_client, method)(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def downloader(self, downloader_class, *dler_args):
+        """
+        创建下载器并借给它一个池中的客户端，下载结束后归还
+
+        下载过程中的章节详情、图片等请求都经过共享的客户端池和缓存。
+        """
+        with self.acquire() as jm_client, downloader_class(self.option, *dler_args) as dler:
+            dler.client = jm_client
+            yield dler
+
+
+def jm_cache_key(*args):
+    """
+    与jmcomic客户端缓存相同的缓存键（只考虑位置参数）
+
+    异步客户端和同步客户端池用相同的位置参数调用时会命中同一条缓存。
+    """
+    if len(args) == 1 and type(args[0]) in (int, str):
+        return args[0]
+    return hash(args)
+
+
+class AsyncJmApiClient:
+    """
+    基于asyncio的禁漫APP端元数据客户端
+
+    只实现 search / categories_filter / get_album_detail 等元数据接口，所有请求共用一个
+    curl_cffi AsyncSession 的长连接池，在事件循环上直接await，不占用线程。
+    MCP请求被取消时，取消会直接传递到正在进行的HTTP请求。
+    签名、解密和解析复用jmcomic的实现；域名、重试次数和缓存取自jmcomic同步客户端，
+    每次请求都按该客户端postman当前的meta_data（impersonate、headers、proxies、cookies等）发送，
+    与jmcomic同步请求的TLS指纹和参数一致，登录插件更新的cookies也会立即生效。
+    """
+
+    def __init__(self, jm_client: JmApiClient, max_connections: int, timeout: float):
+        self.domain_list: List[str] = list(jm_client.domain_list)
+        self.retry_times: int = jm_client.retry_times
+        # 与同步客户端池共享同一个缓存对象，缓存键见 jm_cache_key
+        self.cache = jm_client.CLIENT_CACHE
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._meta: dict = jm_client.get_meta_data()
+        self._session: Optional[AsyncSession] = None
+
+    async def aclose(self):
+        """关闭长连接池，之后的请求会重新创建连接池"""
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
+
+    def _request_kwargs(self, params: dict, headers: dict) -> dict:
+        # 与jmcomic的postman合并参数的方式一致：请求参数覆盖meta_data中的同名项
+        kwargs = dict(self._meta)
+        kwargs.update(params=params, headers=headers, timeout=self.timeout)
+        return kwargs
+
+    async def req_api(self, path: str, params: dict) -> JmApiResp:
+        """按域名列表依次请求，每个域名最多重试 retry_times 次"""
+        if self._session is None:
+            # 在事件循环中创建，连接池大小即最大并发连接数
+            self._session = AsyncSession(max_clients=self.max_connections)
+
+        errors = []
+        for domain in self.domain_list:
+            url = JmcomicText.format_url(path, domain)
+            for _ in range(self.retry_times + 1):
+                if JmModuleConfig.FLAG_USE_FIX_TIMESTAMP:
+                    ts, token, tokenparam = JmModuleConfig.get_fix_ts_token_tokenparam()
+                else:
+                    ts = time_stamp()
+                    token, tokenparam = JmCryptoTool.token_and_tokenparam(ts)
+                headers = {**JmModuleConfig.APP_HEADERS_TEMPLATE, 'token': token, 'tokenparam': tokenparam}
+                try:
+                    resp = await self._session.get(url, **self._request_kwargs(params, headers))
+                    # 与JmApiClient一致：5xx或非json响应视为需要重试
+                    if resp.status_code >= 500 or not resp.text.lstrip().startswith('{'):
+                        raise ValueError(f'异常响应 [{resp.status_code}]: {resp.text[:200]}')
+                except (CurlError, ValueError) as e:
+                    errors.append(f'{url}: {e}')
+                    continue
+                api_resp = JmApiResp(resp, ts)
+                JmApiClient.require_resp_success(api_resp, path)
+                return api_resp
+
+        msg = f'请求重试全部失败: [{path}], {self.domain_list}, {errors[-3:]}'
+        ExceptionTool.raises(msg, {}, RequestRetryAllFailException)
+
+    def _cached(self, key):
+        if self.cache is None:
+            return None
+        return self.cache.get(key)
+
+    def _store(self, key, value):
+        if self.cache is not None:
+            self.cache[key] = value
+        return value
+
+    async def search(self, search_query: str, page: int, main_tag: int, order_by: str,
+                     time: str, category: str, sub_category: Optional[str]) -> JmSearchPage:
+        key = jm_cache_key(search_query, page, main_tag, order_by, time, category, sub_category)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        # APP端不支持 category 和 sub_category，与JmApiClient保持一致
+        params = {
+            'main_tag': main_tag,
+            'search_query': search_query,
+            'page': page,
+            'o': order_by,
+            't': time,
+        }
+        data = (await self.req_api(JmApiClient.API_SEARCH, params)).model_data
+        # 直接搜索禁漫车号时，接口返回 redirect_aid
+        if data.get('redirect_aid', None) is not None:
+            album = await self.get_album_detail(data.redirect_aid)
+            return self._store(key, JmSearchPage.wrap_single_album(album))
+        return self._store(key, JmPageTool.parse_api_to_search_page(data))
+
+    async def categories_filter(self, page: int, time: str, category: str, order_by: str,
+                                sub_category: Optional[str] = None) -> JmCategoryPage:
+        o = f'{order_by}_{time}' if time != JmMagicConstants.TIME_ALL else order_by
+        params = {
+            'page': page,
+            'order': '',
+            'c': category,
+            'o': o,
+        }
+        resp = await self.req_api(JmApiClient.API_CATEGORIES_FILTER, params)
+        return JmPageTool.parse_api_to_search_page(resp.model_data)
+
+    async def week_ranking(self, page: int, category: str = JmMagicConstants.CATEGORY_ALL):
+        return await self.categories_filter(page, JmMagicConstants.TIME_WEEK, category,
+                                            JmMagicConstants.ORDER_BY_VIEW)
+
+    async def month_ranking(self, page: int, category: str = JmMagicConstants.CATEGORY_ALL):
+        return await self.categories_filter(page, JmMagicConstants.TIME_MONTH, category,
+                                            JmMagicConstants.ORDER_BY_VIEW)
+
+    async def get_album_detail(self, album_id) -> JmAlbumDetail:
+        # 同步客户端缓存的是 fetch_detail_entity(album_id, album_class)
+        album_class = JmModuleConfig.album_class()
+        key = jm_cache_key(album_id, album_class)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        jmid = JmcomicText.parse_to_jm_id(album_id)
+        resp = await self.req_api(JmApiClient.API_ALBUM, {'id': jmid})
+        if resp.res_data.get('name') is None:
+            ExceptionTool.raise_missing(resp, jmid)
+        return self._store(key, JmApiAdaptTool.parse_entity(resp.res_data, album_class))
+
+
+class JobScheduler:
+    """
+    后台任务调度器
+
+    所有MCP客户端提交的下载任务共用一个线程池（全局并发为 max_workers），
+    每个客户端同时执行的任务数不超过 per_client_limit，超出的任务在该客户端的队列中等待。
+    相同 dedupe_key 的任务未结束时不会重复提交，而是直接返回已有任务，调用方可以通过任务的
+    context（提交时传入的对象）与已有任务交换信息。
+    任务函数返回 Future 时（例如把PDF转换交给转换线程池），立即释放并发名额，
+    任务在该 Future 完成后才结束。
+    """
+
+    def __init__(self, max_workers: int, per_client_limit: int, history_size: int = 200):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                            thread_name_prefix='jm-job')
+        self._per_client_limit = max(1, per_client_limit)
+        self._history_size = history_size
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = defaultdict(int)
+        self._pending: Dict[str, deque] = defaultdict(deque)
+        self._jobs: Dict[str, dict] = {}
+        self._active_keys: Dict[str, str] = {}
+
+    def submit(self, client_key: str, description: str, func: Callable,
+               dedupe_key: Optional[str] = None, context=None) -> dict:
+        """提交任务，返回任务记录（如果命中去重则返回已有的任务记录）"""
+        with self._lock:
+            if dedupe_key is not None and dedupe_key in self._active_keys:
+                return self._jobs[self._active_keys[dedupe_key]]
+
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'client': client_key,
+                'description': description,
+                'status': 'queued',
+                'error': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'dedupe_key': dedupe_key,
+                'func': func,
+                'context': context,
+            }
+            self._jobs[job['id']] = job
+            if dedupe_key is not None:
+                self._active_keys[dedupe_key] = job['id']
+            self._pending[client_key].append(job)
+            self._dispatch(client_key)
+            self._trim_history()
+            return job
+
+    def _dispatch(self, client_key: str):
+        # 调用方需持有 self._lock
+        pending = self._pending[client_key]
+        while pending and self._running[client_key] < self._per_client_limit:
+            job = pending.popleft()
+            self._running[client_key] += 1
+            self._executor.submit(self._run, job)
+        if not pending:
+            self._pending.pop(client_key, None)
+
+    def _run(self, job: dict):
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+        follow_up = None
+        try:
+            result = job['func']()
+            if isinstance(result, Future):
+                follow_up = result
+            else:
+                self._finish(job, None)
+        except Exception as e:
+            self._finish(job, e)
+        finally:
+            with self._lock:
+                client_key = job['client']
+                self._running[client_key] -= 1
+                if self._running[client_key] <= 0:
+                    self._running.pop(client_key, None)
+                self._dispatch(client_key)
+        if follow_up is not None:
+            follow_up.add_done_callback(
+                lambda f: self._finish(job, RuntimeError('任务已取消') if f.cancelled() else f.exception())
+            )
+
+    def _finish(self, job: dict, error: Optional[BaseException]):
+        if error is None:
+            job['status'] = 'succeeded'
+        else:
+            job['status'] = 'failed'
+            job['error'] = str(error)
+        job['finished_at'] = time.time()
+        with self._lock:
+            job['func'] = None
+            if job['dedupe_key'] is not None:
+                self._active_keys.pop(job['dedupe_key'], None)
+
+    def _trim_history(self):
+        # 调用方需持有 self._lock，只清理已结束的任务
+        finished = [j for j in self._jobs.values() if j['finished_at'] is not None]
+        overflow = len(finished) - self._history_size
+        if overflow > 0:
+            finished.sort(key=lambda j: j['finished_at'])
+            for j in finished[:overflow]:
+                self._jobs.pop(j['id'], None)
+
+    @staticmethod
+    def describe(job: dict) -> dict:
+        """返回可序列化的任务信息"""
+        return {k: v for k, v in job.items() if k not in ('func', 'dedupe_key', 'context')}
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self.describe(job) if job else None
+
+    def list(self, client_key: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            return [self.describe(j) for j in self._jobs.values()
+                    if client_key is None or j['client'] == client_key]
+
+
+class ConversionAdmissionController:
+    """
+    PDF转换的内存准入控制
+
+    每个转换任务在开始前先估算峰值内存，只有在已准入任务的估算总和加上自身不超过预算时才会开始，
+    否则按提交顺序排队等待。单个任务的估算超过整个预算时，等其它任务全部结束后单独执行。
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = max(1, budget_bytes)
+        self._in_use = 0
+        self._waiting: deque = deque()
+        self._cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def admit(self, estimate_bytes: int, name: str = ''):
+        """等待直到预算足够容纳该任务，with块结束后释放预算"""
+        estimate_bytes = max(0, estimate_bytes)
+        ticket = object()
+        with self._cond:
+            self._waiting.append(ticket)
+            if not self._can_admit(ticket, estimate_bytes):
+                print(f"[排队] {name} 预计占用 {estimate_bytes / 2**20:.0f}MB，"
+                      f"当前已占用 {self._in_use / 2**20:.0f}/{self.budget_bytes / 2**20:.0f}MB，等待内存")
+            self._cond.wait_for(lambda: self._can_admit(ticket, estimate_bytes))
+            self._waiting.popleft()
+            self._in_use += estimate_bytes
+            # 队首变化后，后面的任务也可能可以准入
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use -= estimate_bytes
+                self._cond.notify_all()
+
+    def _can_admit(self, ticket, estimate_bytes: int) -> bool:
+        # 调用方需持有 self._cond；严格按提交顺序准入，避免大任务被小任务饿死
+        if self._waiting[0] is not ticket:
+            return False
+        return self._in_use == 0 or self._in_use + estimate_bytes <= self.budget_bytes
+
+
+def default_memory_budget_mb() -> int:
+    """默认的PDF转换内存预算：物理内存的一半，无法获取时为2048MB"""
+    try:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        return max(256, total // 2 // 2**20)
+    except (AttributeError, ValueError, OSError):
+        return 2048
+
+
+# 每个服务端会话首次出现时分配一个唯一标识；不能用 id(session)，会话被回收后id可能被新会话复用
+_session_keys: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_session_keys_lock = threading.Lock()
+
+
+def get_client_key(ctx: Optional[Context]) -> str:
+    """
+    获取发起请求的MCP客户端标识，用于按客户端限制并发
+
+    只使用服务端的会话对象，不使用客户端在请求 _meta 中自行上报的 client_id，避免绕过并发限制。
+    """
+    if ctx is None:
+        return 'default'
+    try:
+        session = ctx.session
+        with _session_keys_lock:
+            key = _session_keys.get(session)
+            if key is None:
+                key = _session_keys[session] = f'session-{uuid.uuid4().hex[:12]}'
+        return key
+    except Exception:
+        return 'default'
+
+
+# 所有MCP客户端共享同一个客户端池和任务调度器
+client_pool = JmClientPool(option, size=args.client_pool_size,
+                           cache=TtlLruCache(args.cache_size, args.cache_ttl))
+job_scheduler = JobScheduler(max_workers=args.max_jobs,
+                             per_client_limit=args.max_jobs_per_client)
+# 保护下载任务 context 中的转换请求（download_comic_album）
+_album_downloads_lock = threading.Lock()
+_open_sessions = 0
+
+
+@contextlib.asynccontextmanager
+async def server_lifespan(server):
+    """
+    MCP会话的生命周期：stdio模式下为整个进程，sse/streamable-http模式下为每个连接
+
+    所有会话都结束时（包括服务关闭）关闭异步元数据客户端的长连接。
+    """
+    global _open_sessions
+    _open_sessions += 1
+    try:
+        yield {}
+    finally:
+        _open_sessions -= 1
+        if _open_sessions == 0 and _async_api_client is not None:
+            await _async_api_client.aclose()
+
+
+app = FastMCP('jm-comic-server', host=args.host, port=args.port, lifespan=server_lifespan)
+
+_async_api_client: Optional[AsyncJmApiClient] = None
+_async_api_client_lock: Optional[asyncio.Lock] = None
+_async_api_client_disabled = args.sync_client
+
+
+async def get_async_api_client() -> Optional[AsyncJmApiClient]:
+    """
+    获取共享的异步元数据客户端，首次调用时创建
+
+    只有配置为APP端（api）客户端时才可用，其它情况返回None，由调用方回退到同步客户端。
+    """
+    global _async_api_client, _async_api_client_lock, _async_api_client_disabled
+    if _async_api_client is not None or _async_api_client_disabled:
+        return _async_api_client
+
+    if _async_api_client_lock is None:
+        _async_api_client_lock = asyncio.Lock()
+    async with _async_api_client_lock:
+        if _async_api_client is None and not _async_api_client_disabled:
+            # 借一个同步客户端作为模板：它在初始化时已经完成了域名更新和cookies获取
+            loop = asyncio.get_running_loop()
+
+            def inspect_client():
+                with client_pool.acquire() as jm_client:
+                    if not isinstance(jm_client, JmApiClient):
+                        return None
+                    return AsyncJmApiClient(jm_client, args.http_max_connections, args.http_timeout)
+
+            _async_api_client = await loop.run_in_executor(None, inspect_client)
+            _async_api_client_disabled = _async_api_client is None
+    return _async_api_client
+
+
+async def call_upstream(method: str, *args, **kwargs):
+    """
+    元数据请求的统一入口
+
+    优先使用异步客户端直接在事件循环上请求；不可用时在线程池中借用同步客户端执行。
+    需要缓存的 search / get_album_detail 应使用位置参数调用，jmcomic的缓存键只在位置参数下
+    与客户端实例无关，这样异步客户端和同步客户端池才能共享缓存。
+    """
+    async_client = await get_async_api_client()
+    if async_client is not None:
+        return await getattr(async_client, method)(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    func = functools.partial(client_pool.call, method, *args, **kwargs)
+    return await loop.run_in_executor(None, func)
+
+# PDF转换使用独立的线程池，排队等待内存的转换不会占用默认线程池
+conversion_admission = ConversionAdmissionController(
+    (args.pdf_memory_budget or default_memory_budget_mb()) * 2**20
+)
+conversion_executor = ThreadPoolExecutor(max_workers=max(1, args.max_conversions),
+                                         thread_name_prefix='jm-pdf')
 
 # 统一的参数映射表
 PARAM_MAPPINGS = {
@@ -147,9 +735,68 @@ def sorted_numeric_subdirs(subdir_list: List[str]) -> List[str]:
     return sorted(subdir_list, key=sort_key)
 
 
+ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+
+def collect_album_images(input_folder: str) -> List[str]:
+    """
+    按页码顺序收集专辑目录中的图片路径
+
+    有章节子目录时按章节顺序依次收集各子目录中的图片，否则收集目录本身的图片。
+    """
+    image_paths = []
+    
+    # 获取所有子目录并排序
+    try:
+        subdirs = [d for d in os.listdir(input_folder) 
+                  if os.path.isdir(os.path.join(input_folder, d))]
+        subdirs = sorted_numeric_subdirs(subdirs)
+    except Exception as e:
+        print(f"错误：无法读取目录 {input_folder}，原因：{e}")
+        return image_paths
+    
+    # 如果没有子目录，直接处理当前目录的图片
+    folders = [os.path.join(input_folder, d) for d in subdirs] if subdirs else [input_folder]
+    for folder in folders:
+        try:
+            files = [f for f in os.listdir(folder)
+                    if os.path.isfile(os.path.join(folder, f)) 
+                    and os.path.splitext(f)[1].lower() in ALLOWED_IMAGE_EXTENSIONS]
+            files = sorted_numeric_filenames(files)
+            for f in files:
+                image_paths.append(os.path.join(folder, f))
+        except Exception as e:
+            print(f"警告：读取目录失败 {folder}，原因：{e}")
+    
+    return image_paths
+
+
+def estimate_conversion_memory(image_paths: List[str]) -> int:
+    """
+    估算把这些图片转换为PDF时的峰值内存（字节）
+
+    只读取图片头获取尺寸，不解码像素。转换过程中所有页面的RGB位图会同时驻留内存，
+    另外最大的一张在转换模式时还需要一份临时副本。
+    """
+    total = 0
+    largest = 0
+    for path in image_paths:
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+        except Exception:
+            continue
+        rgb_bytes = width * height * 3
+        total += rgb_bytes
+        largest = max(largest, width * height * 4)
+    return total + largest
+
+
 def convert_images_to_pdf(input_folder: str, output_path: str, pdf_name: str) -> bool:
     """
     将指定文件夹中的图片转换为PDF
+
+    转换前会按图片尺寸估算内存，并通过 conversion_admission 等待内存预算。
     
     Args:
         input_folder: 输入文件夹路径，包含图片的目录
@@ -160,7 +807,6 @@ def convert_images_to_pdf(input_folder: str, output_path: str, pdf_name: str) ->
         bool: 转换是否成功
     """
     start_time = time.time()
-    allowed_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
     
     # 确保输出目录存在
     output_path = os.path.normpath(output_path)
@@ -174,51 +820,25 @@ def convert_images_to_pdf(input_folder: str, output_path: str, pdf_name: str) ->
         print(f"跳过已有PDF：{pdf_name}.pdf")
         return True
     
-    image_paths = []
-    
     # 检查输入文件夹是否存在
     if not os.path.exists(input_folder):
         print(f"错误：输入文件夹不存在 {input_folder}")
         return False
     
-    # 获取所有子目录并排序
-    try:
-        subdirs = [d for d in os.listdir(input_folder) 
-                  if os.path.isdir(os.path.join(input_folder, d))]
-        subdirs = sorted_numeric_subdirs(subdirs)
-    except Exception as e:
-        print(f"错误：无法读取目录 {input_folder}，原因：{e}")
-        return False
-    
-    # 如果没有子目录，直接处理当前目录的图片
-    if not subdirs:
-        try:
-            files = [f for f in os.listdir(input_folder)
-                    if os.path.isfile(os.path.join(input_folder, f)) 
-                    and os.path.splitext(f)[1].lower() in allowed_extensions]
-            files = sorted_numeric_filenames(files)
-            for f in files:
-                image_paths.append(os.path.join(input_folder, f))
-        except Exception as e:
-            print(f"警告：读取文件夹失败 {input_folder}，原因：{e}")
-    else:
-        # 处理子目录中的图片
-        for subdir in subdirs:
-            subdir_path = os.path.join(input_folder, subdir)
-            try:
-                files = [f for f in os.listdir(subdir_path)
-                        if os.path.isfile(os.path.join(subdir_path, f)) 
-                        and os.path.splitext(f)[1].lower() in allowed_extensions]
-                files = sorted_numeric_filenames(files)
-                for f in files:
-                    image_paths.append(os.path.join(subdir_path, f))
-            except Exception as e:
-                print(f"警告：读取子目录失败 {subdir_path}，原因：{e}")
+    image_paths = collect_album_images(input_folder)
     
     if not image_paths:
         print(f"错误：在 {input_folder} 中未找到任何图片文件")
         return False
     
+    estimate = estimate_conversion_memory(image_paths)
+    with conversion_admission.admit(estimate, pdf_name):
+        return _write_images_to_pdf(image_paths, pdf_full_path, pdf_name, start_time)
+
+
+def _write_images_to_pdf(image_paths: List[str], pdf_full_path: str, pdf_name: str,
+                         start_time: float) -> bool:
+    """打开所有图片并写出PDF"""
     try:
         def open_image(path: str) -> Optional[Image.Image]:
             """安全地打开图片并转换为RGB模式"""
@@ -237,10 +857,12 @@ def convert_images_to_pdf(input_folder: str, output_path: str, pdf_name: str) ->
         
         # 打开第一张图片作为PDF的基础
         valid_images = []
+        valid_paths = []
         for path in image_paths:
             img = open_image(path)
             if img:
                 valid_images.append(img)
+                valid_paths.append(path)
         
         if not valid_images:
             print("错误：没有有效图片可生成PDF")
@@ -263,6 +885,9 @@ def convert_images_to_pdf(input_folder: str, output_path: str, pdf_name: str) ->
         for img in valid_images:
             img.close()
         
+        if args.optimize_pdf:
+            finish_pdf(pdf_full_path, chapter_start_pages(valid_paths))
+        
         print(f"[成功] 成功生成PDF：{pdf_full_path}")
         print(f"处理完成，耗时 {time.time() - start_time:.2f} 秒")
         return True
@@ -272,6 +897,73 @@ def convert_images_to_pdf(input_folder: str, output_path: str, pdf_name: str) ->
         return False
 
 
+def chapter_start_pages(page_paths: List[str]) -> List[tuple]:
+    """
+    根据每一页图片所在的目录计算章节起始页
+
+    Returns:
+        [(章节目录名, 起始页下标)]，只有一个目录时返回空列表
+    """
+    chapters = []
+    last_dir = None
+    for index, path in enumerate(page_paths):
+        page_dir = os.path.dirname(path)
+        if page_dir != last_dir:
+            chapters.append((os.path.basename(page_dir), index))
+            last_dir = page_dir
+    return chapters if len(chapters) > 1 else []
+
+
+def finish_pdf(pdf_path: str, chapters: List[tuple]) -> bool:
+    """
+    PDF后处理：按章节添加页码标签和书签，线性化并压缩对象流
+
+    线性化后阅读器无需加载整个文件即可显示第一页。处理失败时保留原PDF。
+    
+    Args:
+        pdf_path: PDF文件路径，处理结果会覆盖该文件
+        chapters: chapter_start_pages 的返回值
+    
+    Returns:
+        bool: 是否处理成功
+    """
+    if pikepdf is None:
+        print("警告：未安装pikepdf，跳过PDF后处理")
+        return False
+    
+    start_time = time.time()
+    tmp_path = pdf_path + '.tmp'
+    try:
+        with pikepdf.open(pdf_path) as pdf:
+            if chapters:
+                # 页码标签：每章从1开始编号，前缀为章节名，例如 "3-12"
+                nums = pikepdf.Array()
+                for title, start_page in chapters:
+                    nums.append(start_page)
+                    nums.append(pikepdf.Dictionary(S=pikepdf.Name.D, St=1, P=f"{title}-"))
+                pdf.Root.PageLabels = pikepdf.Dictionary(Nums=nums)
+                
+                with pdf.open_outline() as outline:
+                    outline.root.extend(
+                        pikepdf.OutlineItem(title, start_page) for title, start_page in chapters
+                    )
+            
+            pdf.save(
+                tmp_path,
+                linearize=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                compress_streams=True,
+            )
+        os.replace(tmp_path, pdf_path)
+        print(f"[优化] PDF后处理完成：{pdf_path}，耗时 {time.time() - start_time:.2f} 秒")
+        return True
+    except Exception as e:
+        print(f"警告：PDF后处理失败，保留原文件 {pdf_path}，原因：{e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
 def is_recent_directory(dir_path: str, max_age_minutes: int = 10) -> bool:
     """检查目录是否是最近创建的"""
     try:
@@ -321,6 +1013,592 @@ def convert_album_to_pdf(album_dir: str, base_output_dir: Optional[str] = None)
     
     return success
 
+# 图片解混淆进程池
+_decode_pool: Optional[ProcessPoolExecutor] = None
+_decode_pool_lock = threading.Lock()
+
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """
+    获取解混淆进程池，首次调用（或进程池损坏后）时创建
+
+    当前进程只有一个线程时使用fork；已有其它线程时fork不安全，改用spawn（Windows上总是spawn）。
+    提交的函数都在 decode_worker 中，spawn的子进程重新执行本文件时会跳过配置和登录（见 IS_MAIN_PROCESS）。
+    """
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            can_fork = 'fork' in multiprocessing.get_all_start_methods()
+            if can_fork and threading.active_count() == 1:
+                mp_context = multiprocessing.get_context('fork')
+            else:
+                mp_context = multiprocessing.get_context('spawn')
+            _decode_pool = ProcessPoolExecutor(max_workers=args.decode_workers, mp_context=mp_context,
+                                               initializer=init_worker)
+        return _decode_pool
+
+
+def _discard_decode_pool(pool: ProcessPoolExecutor):
+    """丢弃已损坏的进程池，下次 get_decode_pool() 时重新创建"""
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is pool:
+            _decode_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_decode(func: Callable, *func_args) -> tuple:
+    """
+    向解混淆进程池提交任务
+
+    Returns:
+        (进程池, future)，配合 decode_result 使用
+    """
+    pool = get_decode_pool()
+    try:
+        return pool, pool.submit(func, *func_args)
+    except BrokenProcessPool:
+        _discard_decode_pool(pool)
+        pool = get_decode_pool()
+        return pool, pool.submit(func, *func_args)
+
+
+def decode_result(submitted: tuple, func: Callable, *func_args):
+    """
+    等待解混淆任务的结果
+
+    子进程异常退出（例如被OOM杀掉）会使整个进程池损坏，此时重建进程池并重试一次。
+    """
+    pool, future = submitted
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _discard_decode_pool(pool)
+        print(f"[警告] 解混淆进程池已损坏，重建后重试")
+        return get_decode_pool().submit(func, *func_args).result()
+
+
+class OffloadDecodeDownloader(JmDownloader):
+    """
+    把图片解混淆交给进程池的下载器
+
+    下载线程只把服务器返回的原始（混淆）字节写入临时文件，CPU密集的还原和格式转换在
+    get_decode_pool() 的子进程中并行执行，不再受GIL限制。每个章节在 after_photo 之前
+    等待本章节的还原全部完成，保证 after_image → after_photo → after_album 的回调顺序，
+    章节插件看到的都是还原后的图片。还原失败的图片与下载失败一样计入 download_failed_image。
+    """
+
+    RAW_SUFFIX = '.scrambled'
+
+    def __init__(self, option: JmOption) -> None:
+        super().__init__(option)
+        self._decode_tasks: Dict[str, list] = defaultdict(list)
+        self._decode_lock = threading.Lock()
+        # 原始图片的临时文件名带上下载器的唯一标识，同一目录下的其它下载不会覆盖或删除它
+        self._raw_suffix = f'.{uuid.uuid4().hex[:8]}{self.RAW_SUFFIX}'
+
+    @catch_exception
+    def download_by_photo_detail(self, photo: JmPhotoDetail):
+        # 与 JmDownloader.download_by_photo_detail 相同，只是在 after_photo 之前等待本章节的还原
+        self.client.check_photo(photo)
+
+        self.before_photo(photo)
+        if photo.skip:
+            return
+        try:
+            self.execute_on_condition(
+                iter_objs=photo,
+                apply=self.download_by_image_detail,
+                count_batch=self.option.decide_image_batch_count(photo)
+            )
+        finally:
+            self.wait_decode(photo)
+        self.after_photo(photo)
+
+    @catch_exception
+    def download_by_image_detail(self, image: JmImageDetail):
+        decode_image = self.option.decide_download_image_decode(image)
+        if not decode_image:
+            # gif等不需要还原的图片，沿用默认流程（跳过父类的catch_exception，避免重复记录失败）
+            return JmDownloader.download_by_image_detail.__wrapped__(self, image)
+
+        img_save_path = self.option.decide_image_filepath(image)
+        image.save_path = img_save_path
+        image.exists = file_exists(img_save_path)
+
+        self.before_image(image, img_save_path)
+
+        if image.skip:
+            return
+
+        if self.option.decide_download_cache(image) is True and image.exists:
+            return
+
+        resp = self.client.get_jm_image(image.download_url)
+        resp.require_success()
+
+        raw_path = img_save_path + self._raw_suffix
+        with open(raw_path, 'wb') as f:
+            f.write(resp.content)
+
+        task_args = (raw_path, img_save_path, JmImageTool.get_num_by_detail(image))
+        submitted = submit_decode(descramble_image_file, *task_args)
+        with self._decode_lock:
+            self._decode_tasks[image.from_photo.photo_id].append((image, task_args, submitted))
+
+    def wait_decode(self, photo: JmPhotoDetail):
+        """等待该章节所有已提交的还原任务完成"""
+        with self._decode_lock:
+            pending = self._decode_tasks.pop(photo.photo_id, [])
+
+        for image, task_args, submitted in pending:
+            img_save_path = task_args[1]
+            try:
+                decode_result(submitted, descramble_image_file, *task_args)
+            except Exception as e:
+                print(f"[错误] 图片还原失败: {img_save_path}, 原因: {e}")
+                self.download_failed_image.append((image, e))
+                continue
+            self.after_image(image, img_save_path)
+
+
+# 无盘模式：图片下载后不落盘，按页码顺序直接写入PDF/CBZ
+class StreamingPdfWriter:
+    """
+    逐页写出的PDF写入器
+
+    每页的JPEG数据原样作为DCTDecode图片写入文件，不重新编码，写完即可释放；
+    页面树和交叉引用表在 close() 时写出。页面尺寸与Pillow默认的72dpi一致。
+    """
+
+    def __init__(self, path: str):
+        self._f = open(path, 'wb')
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        # 1: Catalog, 2: Pages
+        self._next_id = 3
+        self._f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _write_obj(self, obj_id: int, body: str, stream: Optional[bytes] = None):
+        self._offsets[obj_id] = self._f.tell()
+        self._f.write(f'{obj_id} 0 obj\n{body}'.encode('latin-1'))
+        if stream is not None:
+            self._f.write(b'\nstream\n' + stream + b'\nendstream')
+        self._f.write(b'\nendobj\n')
+
+    def _new_id(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def add_page(self, data: bytes, name: str):
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            if img.format != 'JPEG' or img.mode not in ('RGB', 'L'):
+                raise ValueError(f'页面 {name} 不是RGB/灰度JPEG: {img.format} {img.mode}')
+            colorspace = '/DeviceRGB' if img.mode == 'RGB' else '/DeviceGray'
+
+        image_id, content_id, page_id = self._new_id(), self._new_id(), self._new_id()
+        self._write_obj(
+            image_id,
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace {colorspace} /BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>',
+            data,
+        )
+        content = f'q {width} 0 0 {height} 0 0 cm /Im0 Do Q'.encode('latin-1')
+        self._write_obj(content_id, f'<< /Length {len(content)} >>', content)
+        self._write_obj(
+            page_id,
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] '
+            f'/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>',
+        )
+        self._page_ids.append(page_id)
+
+    def close(self):
+        if self._f.closed:
+            return
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._write_obj(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>')
+        self._write_obj(1, '<< /Type /Catalog /Pages 2 0 R >>')
+
+        xref_offset = self._f.tell()
+        lines = [f'xref\n0 {self._next_id}\n', '0000000000 65535 f \n']
+        lines += [f'{self._offsets[i]:010d} 00000 n \n' for i in range(1, self._next_id)]
+        lines.append(f'trailer\n<< /Size {self._next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n')
+        self._f.write(''.join(lines).encode('latin-1'))
+        self._f.close()
+
+
+class StreamingCbzWriter:
+    """逐页写出的CBZ写入器，图片不压缩直接存入zip"""
+
+    def __init__(self, path: str):
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+        self.page_count = 0
+
+    def add_page(self, data: bytes, name: str):
+        self._zip.writestr(name, data)
+        self.page_count += 1
+
+    def close(self):
+        self._zip.close()
+
+
+class OrderedPageSink:
+    """
+    有界的页面重排缓冲区
+
+    下载线程乱序完成，页面先放入缓冲区，轮到时按页码顺序写入 writer。
+    下载线程在请求图片之前先调用 reserve()，页码超出 [下一页, 下一页 + window) 时会等待，
+    因此同时在下载、还原或缓冲中的页面最多 window 页。
+    下载失败或被跳过的页面以 None 占位，写入时直接跳过。
+    每个章节实际写入第一页时，记录 (章节名, 起始页码) 到 chapters。
+    """
+
+    def __init__(self, writer, window: int):
+        self.writer = writer
+        self.window = max(1, window)
+        self._next = 0
+        self._buffer: Dict[int, tuple] = {}
+        self._done = set()
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self.chapters: List[tuple] = []
+
+    def reserve(self, index: int) -> bool:
+        """
+        等待页码进入窗口
+
+        Returns:
+            bool: 该页已写入或已被跳过时返回False，调用方不需要再下载
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: index < self._next + self.window or self._error is not None)
+            if self._error is not None:
+                raise self._error
+            return index >= self._next and index not in self._done
+
+    def put(self, index: int, data: Optional[bytes], name: str, chapter: Optional[str] = None):
+        """放入页面（data为None表示跳过），不等待窗口，调用方应先 reserve()"""
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            if index < self._next or index in self._done:
+                return
+            self._buffer[index] = (data, name, chapter)
+            self._done.add(index)
+            try:
+                while self._next in self._buffer:
+                    page_data, page_name, page_chapter = self._buffer.pop(self._next)
+                    self._done.discard(self._next)
+                    if page_data is not None:
+                        if page_chapter is not None and (not self.chapters or self.chapters[-1][0] != page_chapter):
+                            self.chapters.append((page_chapter, self.writer.page_count))
+                        self.writer.add_page(page_data, page_name)
+                    self._next += 1
+            except Exception as e:
+                self._error = e
+                raise
+            finally:
+                self._cond.notify_all()
+
+    def skip(self, indexes):
+        """把尚未写入的页面标记为跳过"""
+        for index in indexes:
+            self.put(index, None, '')
+
+
+class StreamingDownloader(JmDownloader):
+    """
+    无盘模式的下载器
+
+    先获取全部章节详情以确定每一页的全局页码，然后并发下载，图片字节在内存中还原后
+    经 OrderedPageSink 按页码顺序直接写入输出文件，中间图片不写入磁盘。
+    配置了 --decode-workers 时，还原和JPEG编码在解混淆进程池中执行，每张图只解码一次。
+    """
+
+    def __init__(self, option: JmOption, sink: OrderedPageSink, to_jpeg: bool):
+        super().__init__(option)
+        self.sink = sink
+        self.to_jpeg = to_jpeg
+        self._photo_offsets: Dict[str, int] = {}
+        self._photo_positions: Dict[str, int] = {}
+
+    def download_by_album_detail(self, album: JmAlbumDetail):
+        photos = list(self.do_filter(album))
+        # 并发获取章节详情（图片列表），确定每页的全局页码
+        with ThreadPoolExecutor(max_workers=max(1, min(len(photos), 8))) as executor:
+            list(executor.map(self.client.check_photo, photos))
+
+        offset = 0
+        for position, photo in enumerate(photos, start=1):
+            self._photo_offsets[photo.photo_id] = offset
+            self._photo_positions[photo.photo_id] = position
+            offset += len(photo)
+
+        super().download_by_album_detail(album)
+
+    def download_by_photo_detail(self, photo: JmPhotoDetail):
+        try:
+            super().download_by_photo_detail(photo)
+        finally:
+            # 被跳过或失败的章节不能阻塞后续页面
+            offset = self._photo_offsets.get(photo.photo_id)
+            if offset is not None:
+                self.sink.skip(range(offset, offset + len(photo)))
+
+    def page_index(self, image: JmImageDetail) -> int:
+        return self._photo_offsets[image.from_photo.photo_id] + image.index - 1
+
+    @catch_exception
+    def download_by_image_detail(self, image: JmImageDetail):
+        index = self.page_index(image)
+        page_label = f'<第{index + 1}页>'
+        image.save_path = page_label
+        image.exists = False
+        data = None
+        try:
+            if not self.sink.reserve(index):
+                return
+            self.before_image(image, page_label)
+            if image.skip:
+                return
+
+            resp = self.client.get_jm_image(image.download_url)
+            resp.require_success()
+
+            decode_image = self.option.decide_download_image_decode(image)
+            num = JmImageTool.get_num_by_detail(image) if decode_image else 0
+            if args.decode_workers > 0 and (num != 0 or self.to_jpeg):
+                task_args = (resp.content, num, self.to_jpeg)
+                data = decode_result(submit_decode(prepare_page_bytes, *task_args), prepare_page_bytes, *task_args)
+            else:
+                data = prepare_page_bytes(resp.content, num, self.to_jpeg)
+
+            suffix = '.jpg' if (num != 0 or self.to_jpeg) else image.img_file_suffix
+            chapter = str(self._photo_positions[image.from_photo.photo_id])
+            self.sink.put(index, data, f'{index + 1:05d}{suffix}', chapter)
+            self.after_image(image, page_label)
+        finally:
+            if data is None:
+                self.sink.put(index, None, '')
+
+
+def stream_album_to_archive(album: JmAlbumDetail, output_format: str) -> str:
+    """
+    无盘模式下载专辑，图片直接写入 {base_dir}/{专辑标题}.pdf 或 .cbz
+
+    输出先写入 .part 临时文件，全部成功后才重命名，失败时删除临时文件。
+    
+    Returns:
+        str: 输出文件路径
+    """
+    output_dir = option.dir_rule.base_dir
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{fix_windir_name(album.name)}.{output_format}")
+    
+    if os.path.exists(output_path):
+        print(f"跳过已有文件：{output_path}")
+        return output_path
+    
+    start_time = time.time()
+    tmp_path = output_path + '.part'
+    is_pdf = output_format == 'pdf'
+    writer = StreamingPdfWriter(tmp_path) if is_pdf else StreamingCbzWriter(tmp_path)
+    try:
+        sink = OrderedPageSink(writer, args.stream_window)
+        with client_pool.downloader(StreamingDownloader, sink, is_pdf) as dler:
+            dler.download_by_album_detail(album)
+            dler.raise_if_has_exception()
+        
+        if writer.page_count == 0:
+            raise ValueError(f"专辑 {album.id} 没有可写入的页面")
+        writer.close()
+        
+        if is_pdf and args.optimize_pdf:
+            finish_pdf(tmp_path, sink.chapters if len(sink.chapters) > 1 else [])
+        
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    print(f"[成功] 无盘模式生成 {output_path}，共 {writer.page_count} 页，耗时 {time.time() - start_time:.2f} 秒")
+    return output_path
+
+
+def convert_downloaded_album(album_id: str, album_title: str) -> bool:
+    """
+    查找已下载专辑的目录并转换为PDF
+
+    Args:
+        album_id: 专辑ID
+        album_title: 专辑标题，用于查找下载目录
+
+    Returns:
+        bool: 转换是否成功
+    """
+    # 检查下载目录
+    download_dir = option.dir_rule.base_dir
+    print(f"[调试] 检查下载目录: {download_dir}")
+    
+    # 使用专辑标题查找目录
+    album_dir = os.path.join(download_dir, album_title)
+    
+    # 列出下载目录中的所有内容
+    if os.path.exists(download_dir):
+        entries = os.listdir(download_dir)
+        print(f"[调试] 下载目录内容: {entries}")
+        
+        # 寻找专辑文件夹
+        print(f"[调试] 期望的专辑目录（按标题）: {album_dir}")
+        
+        if os.path.exists(album_dir):
+            print(f"[调试] 找到专辑目录: {album_dir}")
+            # 列出专辑目录内容
+            album_contents = os.listdir(album_dir)
+            print(f"[调试] 专辑目录内容: {album_contents}")
+        else:
+            print(f"[调试] 专辑目录不存在，查找可能的目录...")
+            # 查找可能的专辑目录 - 使用多种匹配策略
+            found_by_title = False
+            for entry in entries:
+                entry_path = os.path.join(download_dir, entry)
+                if os.path.isdir(entry_path):
+                    print(f"[调试] 发现目录: {entry}")
+                    # 策略1：完全匹配标题
+                    if entry == album_title:
+                        album_dir = entry_path
+                        print(f"[调试] 完全匹配标题: {album_dir}")
+                        found_by_title = True
+                        break
+                    # 策略2：标题包含关系
+                    elif album_title in entry or entry in album_title:
+                        album_dir = entry_path
+                        print(f"[调试] 部分匹配标题: {album_dir}")
+                        found_by_title = True
+                        break
+            
+            # 如果通过标题没找到，再尝试其他策略
+            if not found_by_title:
+                for entry in entries:
+                    entry_path = os.path.join(download_dir, entry)
+                    if os.path.isdir(entry_path):
+                        # 策略3：包含专辑ID
+                        if album_id in entry:
+                            album_dir = entry_path
+                            print(f"[调试] 通过ID匹配: {album_dir}")
+                            break
+                        # 策略4：最近创建的目录
+                        elif is_recent_directory(entry_path, max_age_minutes=30):
+                            album_dir = entry_path
+                            print(f"[调试] 最近创建的目录: {album_dir}")
+                            break
+    
+    print(f"[转换] 开始转换专辑 {album_id} 为PDF")
+    
+    success = False
+    if os.path.exists(album_dir):
+        print(f"[调试] 使用目录进行转换: {album_dir}")
+        success = convert_album_to_pdf(album_dir, download_dir)
+        if success:
+            print(f"[成功] 专辑 {album_id} PDF转换完成")
+            # 检查PDF是否真的生成了
+            pdf_path = os.path.join(download_dir, f"{os.path.basename(album_dir)}.pdf")
+            if os.path.exists(pdf_path):
+                print(f"[验证] PDF文件已生成: {pdf_path}")
+            else:
+                print(f"[警告] PDF文件未找到: {pdf_path}")
+        else:
+            print(f"[失败] 专辑 {album_id} PDF转换失败")
+    else:
+        print(f"[调试] 专辑目录不存在，查找可能的目录...")
+        # 查找可能的专辑目录
+        found_dir = None
+        if os.path.exists(download_dir):
+            # 获取所有目录并按创建时间排序
+            dir_candidates = []
+            for item in os.listdir(download_dir):
+                item_path = os.path.join(download_dir, item)
+                if os.path.isdir(item_path):
+                    try:
+                        creation_time = os.path.getctime(item_path)
+                        dir_candidates.append({
+                            'path': item_path,
+                            'name': item,
+                            'creation_time': creation_time,
+                            'age_minutes': (time.time() - creation_time) / 60
+                        })
+                    except:
+                        continue
+            
+            # 按创建时间排序，最新的在前
+            dir_candidates.sort(key=lambda x: x['creation_time'], reverse=True)
+            
+            # 查找最合适的目录
+            for candidate in dir_candidates:
+                print(f"[尝试] 检查目录: {candidate['name']} (创建于{candidate['age_minutes']:.1f}分钟前)")
+                
+                # 优先级1：完全匹配专辑标题
+                if candidate['name'] == album_title:
+                    print(f"[找到] 完全匹配标题: {candidate['path']}")
+                    found_dir = candidate['path']
+                    break
+                
+                # 优先级2：部分匹配专辑标题
+                elif album_title in candidate['name'] or candidate['name'] in album_title:
+                    print(f"[找到] 部分匹配标题: {candidate['path']}")
+                    found_dir = candidate['path']
+                    break
+                
+                # 优先级3：包含专辑ID的目录
+                elif album_id in candidate['name']:
+                    print(f"[找到] 专辑ID匹配目录: {candidate['path']}")
+                    found_dir = candidate['path']
+                    break
+                
+                # 优先级4：最近30分钟内创建的目录（可能是刚下载的）
+                elif candidate['age_minutes'] <= 30:
+                    # 检查目录是否包含图片文件
+                    try:
+                        contents = os.listdir(candidate['path'])
+                        has_images = any(
+                            os.path.splitext(f)[1].lower() in ALLOWED_IMAGE_EXTENSIONS
+                            for f in contents
+                            if os.path.isfile(os.path.join(candidate['path'], f))
+                        )
+                        if has_images:
+                            print(f"[找到] 最近创建的图片目录: {candidate['path']}")
+                            found_dir = candidate['path']
+                            break
+                    except:
+                        continue
+        
+        if found_dir:
+            print(f"[转换] 使用找到的目录进行转换: {found_dir}")
+            success = convert_album_to_pdf(found_dir, download_dir)
+            if success:
+                print(f"[成功] 专辑 {album_id} 使用 {found_dir} 转换PDF成功")
+                # 检查PDF是否真的生成了
+                pdf_path = os.path.join(download_dir, f"{os.path.basename(found_dir)}.pdf")
+                if os.path.exists(pdf_path):
+                    print(f"[验证] PDF文件已生成: {pdf_path}")
+                else:
+                    print(f"[警告] PDF文件未找到: {pdf_path}")
+            else:
+                print(f"[失败] 专辑 {album_id} PDF转换失败")
+        else:
+            print(f"[错误] 无法找到专辑 {album_id} 的下载目录")
+    
+    return success
+
+
 @app.tool()
 async def search_comic(
     query: str, 
@@ -351,19 +1629,16 @@ async def search_comic(
         time_value = get_mapped_value('time', time_period, 'all')
         category_value = get_mapped_value('category', category, 'all')
         
-        loop = asyncio.get_running_loop()
-        func = functools.partial(
-            client.search,
-            search_query=query,
-            page=page,
-            main_tag=main_tag,
-            order_by=order_value,
-            time=time_value,
-            category=category_value,
-            sub_category=None
-        )
-        search_page: JmSearchPage = await loop.run_in_executor(
-            None, func
+        # 按 search_query, page, main_tag, order_by, time, category, sub_category 的顺序传位置参数，以共享缓存
+        search_page: JmSearchPage = await call_upstream(
+            'search',
+            query,
+            page,
+            main_tag,
+            order_value,
+            time_value,
+            category_value,
+            None
         )
         results = []
         for album_id, title in itertools.islice(search_page, 20):  # 返回20个结果
@@ -409,11 +1684,7 @@ async def get_album_details(album_id: str) -> str:
         A JSON string containing the album details.
     """
     try:
-        loop = asyncio.get_running_loop()
-        func = functools.partial(client.get_album_detail, album_id)
-        album: JmAlbumDetail = await loop.run_in_executor(
-            None, func
-        )
+        album: JmAlbumDetail = await call_upstream('get_album_detail', album_id)
         details = {
             "id": album.id,
             "title": album.title,
@@ -439,25 +1710,21 @@ async def get_ranking_list(period: str = 'week') -> str:
         A JSON string containing the ranking list.
     """
     try:
-        loop = asyncio.get_running_loop()
         ranking_page = None
         period_lower = period.lower()
 
         if period_lower == 'month':
-            func = functools.partial(client.month_ranking, page=1)
-            ranking_page = await loop.run_in_executor(None, func)
+            ranking_page = await call_upstream('month_ranking', page=1)
         elif period_lower == 'all':
-            func = functools.partial(
-                client.categories_filter,
+            ranking_page = await call_upstream(
+                'categories_filter',
                 page=1,
                 category=JmMagicConstants.CATEGORY_ALL,
                 time=JmMagicConstants.TIME_ALL,
                 order_by=JmMagicConstants.ORDER_BY_VIEW
             )
-            ranking_page = await loop.run_in_executor(None, func)
         else:  # Default to 'week'
-            func = functools.partial(client.week_ranking, page=1)
-            ranking_page = await loop.run_in_executor(None, func)
+            ranking_page = await call_upstream('week_ranking', page=1)
 
         results = []
         for album_id, title in itertools.islice(ranking_page, 10):
@@ -498,17 +1765,14 @@ async def filter_comics_by_category(
         order_value = get_mapped_value('order', order_by, 'latest')
         
         # 执行筛选请求
-        loop = asyncio.get_running_loop()
-        func = functools.partial(
-            client.categories_filter,
+        category_page: JmCategoryPage = await call_upstream(
+            'categories_filter',
             page=page,
             category=category_value,
             time=time_value,
             order_by=order_value
         )
         
-        category_page: JmCategoryPage = await loop.run_in_executor(None, func)
-        
         results = []
         for album_id, title in itertools.islice(category_page, 20):  # 返回20个结果
             results.append({"id": album_id, "title": title})
@@ -537,17 +1801,33 @@ async def filter_comics_by_category(
         return json.dumps({"error": f"An unexpected error occurred: {e}"})
 
 @app.tool()
-async def download_comic_album(album_id: str, convert_to_pdf: bool = True) -> str:
+async def download_comic_album(album_id: str, convert_to_pdf: bool = True,
+                               diskless: bool = False, output_format: str = 'pdf',
+                               ctx: Optional[Context] = None) -> str:
     """
     Downloads a comic album and optionally converts it to PDF.
 
+    The download runs as a background job on the shared job scheduler. Use
+    get_job_status with the returned job id to follow its progress.
+
     Args:
         album_id: The ID of the album to download.
         convert_to_pdf: Whether to convert the downloaded images to PDF after download completes.
+        diskless: Stream the downloaded pages straight into a single output file in page
+                  order without saving the individual images to disk. convert_to_pdf is
+                  ignored in this mode.
+        output_format: Output file format in diskless mode. Options: 'pdf', 'cbz'. Defaults to 'pdf'.
 
     Returns:
         A message indicating the download status and PDF conversion status.
     """
+    output_format = output_format.lower()
+    if diskless and output_format not in ('pdf', 'cbz'):
+        return f"不支持的输出格式: {output_format}，可选 'pdf' 或 'cbz'"
+
+    # 同一专辑同一时间只有一个下载任务，任何调用方要求转换PDF时，下载结束后都会转换
+    request = {'convert_to_pdf': convert_to_pdf, 'decided': False}
+
     def download_and_convert():
         """下载并转换的函数，在后台线程中运行"""
         try:
@@ -555,188 +1835,110 @@ async def download_comic_album(album_id: str, convert_to_pdf: bool = True) -> st
             print(f"[调试] 下载目录: {option.dir_rule.base_dir}")
             
             # 先获取专辑详情以得到标题
-            album_detail = client.get_album_detail(album_id)
+            album_detail = client_pool.call('get_album_detail', album_id)
             album_title = album_detail.title
             print(f"[调试] 专辑标题: {album_title}")
             
-            # 执行下载
-            download_album(album_id, option)
-            print(f"[完成] 专辑 {album_id} 下载完成")
-            
-            # 检查下载目录
-            download_dir = option.dir_rule.base_dir
-            print(f"[调试] 检查下载目录: {download_dir}")
-            
-            # 使用专辑标题查找目录
-            album_dir = os.path.join(download_dir, album_title)
+            if diskless:
+                # 无盘模式：图片直接写入输出文件，不需要再查找目录和转换
+                output_path = stream_album_to_archive(album_detail, output_format)
+                print(f"[完成] 专辑 {album_id} 已保存到 {output_path}")
+                return
             
-            # 列出下载目录中的所有内容
-            if os.path.exists(download_dir):
-                entries = os.listdir(download_dir)
-                print(f"[调试] 下载目录内容: {entries}")
-                
-                # 寻找专辑文件夹
-                print(f"[调试] 期望的专辑目录（按标题）: {album_dir}")
-                
-                if os.path.exists(album_dir):
-                    print(f"[调试] 找到专辑目录: {album_dir}")
-                    # 列出专辑目录内容
-                    album_contents = os.listdir(album_dir)
-                    print(f"[调试] 专辑目录内容: {album_contents}")
-                else:
-                    print(f"[调试] 专辑目录不存在，查找可能的目录...")
-                    # 查找可能的专辑目录 - 使用多种匹配策略
-                    found_by_title = False
-                    for entry in entries:
-                        entry_path = os.path.join(download_dir, entry)
-                        if os.path.isdir(entry_path):
-                            print(f"[调试] 发现目录: {entry}")
-                            # 策略1：完全匹配标题
-                            if entry == album_title:
-                                album_dir = entry_path
-                                print(f"[调试] 完全匹配标题: {album_dir}")
-                                found_by_title = True
-                                break
-                            # 策略2：标题包含关系
-                            elif album_title in entry or entry in album_title:
-                                album_dir = entry_path
-                                print(f"[调试] 部分匹配标题: {album_dir}")
-                                found_by_title = True
-                                break
-                    
-                    # 如果通过标题没找到，再尝试其他策略
-                    if not found_by_title:
-                        for entry in entries:
-                            entry_path = os.path.join(download_dir, entry)
-                            if os.path.isdir(entry_path):
-                                # 策略3：包含专辑ID
-                                if album_id in entry:
-                                    album_dir = entry_path
-                                    print(f"[调试] 通过ID匹配: {album_dir}")
-                                    break
-                                # 策略4：最近创建的目录
-                                elif is_recent_directory(entry_path, max_age_minutes=30):
-                                    album_dir = entry_path
-                                    print(f"[调试] 最近创建的目录: {album_dir}")
-                                    break
+            # 执行下载，配置了解混淆进程时使用进程池还原图片
+            if args.decode_workers > 0:
+                downloader_class = OffloadDecodeDownloader
+            else:
+                downloader_class = JmModuleConfig.downloader_class()
+            with client_pool.downloader(downloader_class) as dler:
+                dler.download_by_album_detail(album_detail)
+                dler.raise_if_has_exception()
+            print(f"[完成] 专辑 {album_id} 下载完成")
             
-            if convert_to_pdf:
-                print(f"[转换] 开始转换专辑 {album_id} 为PDF")
-                
-                if os.path.exists(album_dir):
-                    print(f"[调试] 使用目录进行转换: {album_dir}")
-                    success = convert_album_to_pdf(album_dir, download_dir)
-                    if success:
-                        print(f"[成功] 专辑 {album_id} PDF转换完成")
-                        # 检查PDF是否真的生成了
-                        pdf_path = os.path.join(download_dir, f"{os.path.basename(album_dir)}.pdf")
-                        if os.path.exists(pdf_path):
-                            print(f"[验证] PDF文件已生成: {pdf_path}")
-                        else:
-                            print(f"[警告] PDF文件未找到: {pdf_path}")
-                    else:
-                        print(f"[失败] 专辑 {album_id} PDF转换失败")
-                else:
-                    print(f"[调试] 专辑目录不存在，查找可能的目录...")
-                    # 查找可能的专辑目录
-                    found_dir = None
-                    if os.path.exists(download_dir):
-                        # 获取所有目录并按创建时间排序
-                        dir_candidates = []
-                        for item in os.listdir(download_dir):
-                            item_path = os.path.join(download_dir, item)
-                            if os.path.isdir(item_path):
-                                try:
-                                    creation_time = os.path.getctime(item_path)
-                                    dir_candidates.append({
-                                        'path': item_path,
-                                        'name': item,
-                                        'creation_time': creation_time,
-                                        'age_minutes': (time.time() - creation_time) / 60
-                                    })
-                                except:
-                                    continue
-                        
-                        # 按创建时间排序，最新的在前
-                        dir_candidates.sort(key=lambda x: x['creation_time'], reverse=True)
-                        
-                        # 查找最合适的目录
-                        for candidate in dir_candidates:
-                            print(f"[尝试] 检查目录: {candidate['name']} (创建于{candidate['age_minutes']:.1f}分钟前)")
-                            
-                            # 优先级1：完全匹配专辑标题
-                            if candidate['name'] == album_title:
-                                print(f"[找到] 完全匹配标题: {candidate['path']}")
-                                found_dir = candidate['path']
-                                break
-                            
-                            # 优先级2：部分匹配专辑标题
-                            elif album_title in candidate['name'] or candidate['name'] in album_title:
-                                print(f"[找到] 部分匹配标题: {candidate['path']}")
-                                found_dir = candidate['path']
-                                break
-                            
-                            # 优先级3：包含专辑ID的目录
-                            elif album_id in candidate['name']:
-                                print(f"[找到] 专辑ID匹配目录: {candidate['path']}")
-                                found_dir = candidate['path']
-                                break
-                            
-                            # 优先级4：最近30分钟内创建的目录（可能是刚下载的）
-                            elif candidate['age_minutes'] <= 30:
-                                # 检查目录是否包含图片文件
-                                try:
-                                    contents = os.listdir(candidate['path'])
-                                    has_images = any(
-                                        os.path.splitext(f)[1].lower() in ['.jpg', '.jpeg', '.png', '.webp', '.bmp']
-                                        for f in contents
-                                        if os.path.isfile(os.path.join(candidate['path'], f))
-                                    )
-                                    if has_images:
-                                        print(f"[找到] 最近创建的图片目录: {candidate['path']}")
-                                        found_dir = candidate['path']
-                                        break
-                                except:
-                                    continue
-                    
-                    if found_dir:
-                        print(f"[转换] 使用找到的目录进行转换: {found_dir}")
-                        success = convert_album_to_pdf(found_dir, download_dir)
-                        if success:
-                            print(f"[成功] 专辑 {album_id} 使用 {found_dir} 转换PDF成功")
-                            # 检查PDF是否真的生成了
-                            pdf_path = os.path.join(download_dir, f"{os.path.basename(found_dir)}.pdf")
-                            if os.path.exists(pdf_path):
-                                print(f"[验证] PDF文件已生成: {pdf_path}")
-                            else:
-                                print(f"[警告] PDF文件未找到: {pdf_path}")
-                        else:
-                            print(f"[失败] 专辑 {album_id} PDF转换失败")
-                    else:
-                        print(f"[错误] 无法找到专辑 {album_id} 的下载目录")
+            with _album_downloads_lock:
+                # 到这里之后再提交的转换请求会作为单独的任务执行
+                request['decided'] = True
+                need_pdf = request['convert_to_pdf']
+            if need_pdf:
+                # 转换在转换线程池中执行，受 --max-conversions 限制，等待内存时不占用下载任务名额
+                return conversion_executor.submit(convert_downloaded_album, album_id, album_title)
             
         except JmcomicException as e:
             print(f"[错误] 下载专辑 {album_id} 失败: {e}")
             import traceback
             print(f"[调试] 详细错误信息:")
             traceback.print_exc()
+            raise
         except Exception as e:
             print(f"[错误] 处理专辑 {album_id} 时发生错误: {e}")
             import traceback
             print(f"[调试] 详细错误信息:")
             traceback.print_exc()
+            raise
     
     try:
-        # 在后台线程中执行下载和转换
-        thread = threading.Thread(target=download_and_convert, daemon=True)
-        thread.start()
+        # 提交到共享的任务调度器，同一专辑正在下载时直接复用已有任务
+        if diskless:
+            description = f"download album {album_id} -> {output_format} (diskless)"
+            dedupe_key = f"download:{album_id}:diskless:{output_format}"
+        else:
+            # 下载到磁盘的任务只按专辑去重，避免两个任务同时写同一个目录
+            description = f"download album {album_id}" + (" + pdf" if convert_to_pdf else "")
+            dedupe_key = f"download:{album_id}"
+        with _album_downloads_lock:
+            job = job_scheduler.submit(
+                client_key=get_client_key(ctx),
+                description=description,
+                func=download_and_convert,
+                dedupe_key=dedupe_key,
+                context=None if diskless else request,
+            )
+            existing = job['context']
+            if existing is not None and existing is not request and convert_to_pdf:
+                if not existing['decided']:
+                    existing['convert_to_pdf'] = True
+                elif not existing['convert_to_pdf']:
+                    # 已有任务下载完成且不转换，单独提交转换任务
+                    def convert_after_download():
+                        album_title = client_pool.call('get_album_detail', album_id).title
+                        return conversion_executor.submit(convert_downloaded_album, album_id, album_title)
+
+                    job = job_scheduler.submit(
+                        client_key=get_client_key(ctx),
+                        description=f"convert album {album_id} to pdf",
+                        func=convert_after_download,
+                        dedupe_key=f"pdf:{album_id}",
+                    )
         
-        conversion_msg = " 并转换为PDF" if convert_to_pdf else ""
-        return f"专辑 {album_id} 的下载{conversion_msg}已在后台开始执行。请查看控制台输出获取详细信息。"
+        if diskless:
+            conversion_msg = f" 并直接写入{output_format.upper()}（无盘模式）"
+        else:
+            conversion_msg = " 并转换为PDF" if convert_to_pdf else ""
+        return (f"专辑 {album_id} 的下载{conversion_msg}已提交到后台任务队列（任务ID: {job['id']}，"
+                f"状态: {job['status']}）。可使用 get_job_status 查询进度。")
         
     except Exception as e:
         return f"启动专辑 {album_id} 下载失败: {e}"
 
+@app.tool()
+async def get_job_status(job_id: Optional[str] = None, ctx: Optional[Context] = None) -> str:
+    """
+    Gets the status of background jobs.
+
+    Args:
+        job_id: The ID of the job returned by download_comic_album. If not provided,
+                returns all recent jobs submitted by the calling client.
+
+    Returns:
+        A JSON string containing the job status.
+    """
+    if job_id:
+        job = job_scheduler.get(job_id)
+        if job is None:
+            return json.dumps({"error": f"Job not found: {job_id}"})
+        return json.dumps(job, ensure_ascii=False)
+    return json.dumps(job_scheduler.list(get_client_key(ctx)), ensure_ascii=False)
+
 @app.tool()
 async def convert_album_to_pdf_tool(album_id: str, album_dir: Optional[str] = None) -> str:
     """
@@ -766,7 +1968,8 @@ async def convert_album_to_pdf_tool(album_id: str, album_dir: Optional[str] = No
             base_output_dir = os.path.dirname(album_dir)
             return convert_album_to_pdf(album_dir, base_output_dir)
         
-        success = await loop.run_in_executor(None, convert)
+        # 使用独立的转换线程池，内存准入排队不会阻塞其它工具
+        success = await loop.run_in_executor(conversion_executor, convert)
         
         if success:
             return f"[成功] 专辑 {album_id} 已成功转换为PDF"
@@ -779,4 +1982,9 @@ async def convert_album_to_pdf_tool(album_id: str, album_dir: Optional[str] = No
 
 
 if __name__ == "__main__":
-    app.run(transport='stdio')
+    if args.decode_workers > 0:
+        # 在启动任何后台线程之前创建解混淆进程池，并提交一个空任务让子进程立即启动
+        get_decode_pool().submit(os.getpid).result()
+    if args.transport != 'stdio':
+        print(f"以 {args.transport} 模式启动，监听 {args.host}:{args.port}")
+    app.run(transport=args.transport)